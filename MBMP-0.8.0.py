@@ -1,11 +1,20 @@
 #!/usr/bin/env python3
 # MrB-ModPlay 0.8.0
-import sys,struct,threading,time,math,glob,platform,queue
+import sys,time
+_T0=time.perf_counter()   # for --startup-time
+import os,struct,threading,math,glob,platform,queue
 from pathlib import Path
-try:import numpy as np,sounddevice as sd
-except ImportError:sys.exit("pip install sounddevice numpy")
+try:import numpy as np
+except ImportError:sys.exit("pip install numpy")
+# heavier modules (sounddevice/PortAudio, asyncio, ...) are imported where
+# they are first needed, so headless commands start fast and need no audio
+sd=None
 
-SR=44100
+SR=44100   # default output rate; each Player can render at its own (sr=)
+# sample interpolation: 'nearest' (cheapest), 'linear', 'cubic' (Catmull-Rom)
+INTERP='linear'
+# --preview: low rate + nearest interpolation for cheap batch previews
+PREVIEW_SR=22050
 # Amiga clock (PAL) for MOD period math only
 PAL=7093789.2
 # S3M uses its own clock constant
@@ -15,8 +24,27 @@ XM_APC=14317456.0
 # 64-entry sine table for vibrato/tremolo (values -127..127)
 SIN=[int(127*math.sin(math.pi*2*i/64))for i in range(64)]
 EXTS={'.mod','.s3m','.xm','.it'}
+ARCS={'.zip'}   # module packs read in place: 'pack.zip/dir/song.xm'
 IS_WIN=platform.system()=='Windows'
 BLKSIZE=2048;QMAX=32
+# IT virtual voices: max background (NNA) voices per player, steal policy
+MAXVOICES=64;VSTEAL='vol'   # 'vol' = quietest first, 'age' = oldest first
+# streaming server: per-client backlog (blocks), seconds rendered ahead of real time
+SBACKLOG=16;SLEAD=0.5
+# threaded mixing: threads per player (0/1 = off), min active voices*frames per chunk
+MTHREADS=0;MTMIN=8192
+# row render cache: MB of memoized row PCM per player (0 = off), LRU evicted
+MEMO=0
+# loudness normalization: target (LUFS-style), peak ceiling, apply cached gains
+LTARGET=-16.0;PEAKMAX=0.98;NORM=True
+# waveform overviews: frames per min/max pair
+PEAKW=256
+# gapless playlists: seconds before song end to start preloading the next file
+PRELOAD=10.0;GAPLESS=False
+# bulk loader validation (--validate): per-file memory cap (MB) and time limit (s)
+VMEM=512;VTIME=20.0
+# on-disk cache for decoded data (MBMP_CACHE='' disables it)
+CACHE=os.environ.get('MBMP_CACHE',str(Path.home()/'.cache'/'mbmp'))
 # MOD/XM amiga period table for C-B (octave reference)
 _APT=[1712,1616,1524,1440,1356,1280,1208,1140,1076,1016,960,907]
 MOD_TAGS={b'M.K.':4,b'M!K!':4,b'FLT4':4,b'4CHN':4,b'6CHN':6,b'8CHN':8,
@@ -54,23 +82,157 @@ class Smp:
   self.ls=0;self.ll=0;self.c5=8363;self.relnote=0
   self.data=np.zeros(0,dtype=np.float32)
 
+class Ins:
+ __slots__=('name','nna','fade','fsp','ftab','venv','penv')
+ def __init__(self):
+  self.name='';self.nna=0;self.fade=0   # nna: 0=cut 1=continue 2=off 3=fade
+  self.fsp=0.0;self.ftab=_fade(0.0)     # fadeout per tick, as a gain table
+  self.venv=self.penv=None              # volume/pan Env, None = off
+
+class Env:
+ """Envelope precomputed to one value per tick (see _env); sb..se is the
+ sustain loop, lb..le the loop, in ticks (-1 = none); o: offset in Mod.etab()."""
+ __slots__=('v','sb','se','lb','le','o')
+ def step(self,p,held):
+  """Tick index after p: wraps at the sustain loop while the key is held,
+  then at the loop, else stops on the last value."""
+  p+=1
+  if held and 0<=self.se<p:return self.sb
+  if 0<=self.le<p:return self.lb
+  return min(p,len(self.v)-1)
+
 class Trk:
- __slots__=('snum','eff','prm','freq','tfreq','pos','per','bper','s3mper',
-            'vol','pan','on','ptgt','pspd','vp','vs','vd')
+ __slots__=('snum','ins','eff','prm','freq','tfreq','pos','per','bper','s3mper',
+            'vol','pan','on','ptgt','pspd','vp','vs','vd','gl','gr','gk',
+            'ei','vep','pep','fp','held','ev','fv','epn')
  def __init__(self):
-  self.snum=self.eff=self.prm=0
+  self.snum=self.ins=self.eff=self.prm=0
   self.freq=self.tfreq=self.pos=0.0
   self.per=self.bper=0          # amiga period (MOD/XM-amiga)
   self.s3mper=0                 # ST3 period (S3M portamento math)
   self.vol=64;self.pan=128;self.on=False
   self.ptgt=self.pspd=self.vp=self.vs=self.vd=0
+  self.gl=self.gr=0.0;self.gk=None   # cached L/R gain for (pan,vol,...)=gk
+  # XM/IT instrument envelopes: instrument, vol/pan env tick, fade tick
+  # (-1 = not fading), key held, current env volume, fade gain, pan offset
+  self.ei=None;self.vep=self.pep=0;self.fp=-1;self.held=True
+  self.ev=self.fv=1.0;self.epn=0.0
 
 class Mod:
  def __init__(self):
   self.fmt='?';self.title='';self.smp=[Smp()]   # smp[0] = dummy
   self.orders=[];self.pats=[];self.nc=4;self.sl=0
-  self.bpm=125;self.spd=6;self.ntbl=[];self.linear=True
+  self.bpm=125;self.spd=6;self.ntbl=[];self.ins=[];self.linear=True
+  self._bk=self._et=None;self.fk=None   # fk: content hash, set by load() (cache key)
  def row(self,o,r):return self.pats[self.orders[o]][r]
+ def bank(self):
+  """All sample data as one flat float32 array plus per-sample
+  (offset,length,loop start,loop length) arrays, for batched mixing."""
+  if self._bk is None:
+   lens=np.array([len(s.data) for s in self.smp],dtype=np.int64)
+   offs=np.zeros(len(lens),dtype=np.int64);offs[1:]=np.cumsum(lens)[:-1]
+   ls=np.array([s.ls for s in self.smp],dtype=np.float64)
+   ll=np.array([s.ll if s.ll>2 and s.ls+s.ll<=len(s.data) else 0 for s in self.smp],dtype=np.float64)
+   d=np.concatenate([s.data for s in self.smp]) if lens.sum() else np.zeros(1,np.float32)
+   self._bk=(d,offs,lens,ls,ll)
+  return self._bk
+ def etab(self):
+  """All volume envelopes as one flat float32 table (each Env's o is its
+  offset), so background voices look theirs up in one batched gather."""
+  if self._et is None:
+   es=[i.venv for i in self.ins if i.venv];o=0
+   for e in es:e.o=o;o+=len(e.v)
+   self._et=np.concatenate([e.v for e in es]) if es else np.ones(1,np.float32)
+  return self._et
+
+# ── module cache ──────────────────────────────────────────────────────────────
+def _cpath(kind,key):return Path(CACHE)/kind/f'{key}.npy'
+
+def _cget(kind,key):
+ """Cached array for key, or None."""
+ if not CACHE:return None
+ try:return np.load(_cpath(kind,key))
+ except:return None
+
+def _cput(kind,key,arr):
+ if not CACHE:return
+ try:
+  p=_cpath(kind,key);p.parent.mkdir(parents=True,exist_ok=True)
+  tmp=p.with_suffix(f'.{os.getpid()}.tmp')
+  with open(tmp,'wb') as f:np.save(f,arr)
+  os.replace(tmp,p)
+ except:pass
+
+def _fkey(data):
+ import hashlib
+ return hashlib.sha1(data).hexdigest()
+
+# ── shared sample pool ────────────────────────────────────────────────────────
+class ShmPool:
+ """A Mod's sample bank published in one shared memory segment, so worker
+ processes rendering the same module share a single copy of the PCM.
+ Create it in the parent (the Mod's samples become views into the segment),
+ hand it to workers through Process args or a Pool initializer (it pickles to
+ a small handle, or is inherited as is under fork) and call attach() there.
+ The segment is unlinked once the owner and every worker that attached have
+ called release(), so the owner must not release before all workers have
+ attached."""
+ def __init__(self,mod):
+  from multiprocessing import shared_memory,Lock
+  import copy
+  d,offs,lens,ls,ll=mod.bank()
+  self._lk=Lock();self.n=len(d);self._meta=(offs,lens,ls,ll)
+  self._sm=shared_memory.SharedMemory(create=True,size=8+d.nbytes)
+  self.name=self._sm.name
+  self._rc()[0]=1                                    # refcount: the owner
+  np.ndarray(self.n,dtype=np.float32,buffer=self._sm.buf,offset=8)[:]=d
+  self._stub=copy.copy(mod);self._stub._bk=None
+  self._stub.smp=[copy.copy(s) for s in mod.smp]
+  for s in self._stub.smp:s.data=None
+  self.mod=mod;self._bind(mod)
+  self._pid=os.getpid()                              # process holding a reference
+
+ def __getstate__(self):
+  return{'name':self.name,'n':self.n,'_lk':self._lk,'_meta':self._meta,'_stub':self._stub}
+ def __setstate__(self,st):
+  self.__dict__.update(st);self._sm=None;self.mod=None;self._pid=None
+ def __enter__(self):return self
+ def __exit__(self,*a):self.release()
+
+ def _rc(self):return np.ndarray(1,dtype=np.int64,buffer=self._sm.buf)
+
+ def _bind(self,m):
+  b=np.ndarray(self.n,dtype=np.float32,buffer=self._sm.buf,offset=8)
+  b.flags.writeable=False
+  offs,lens,ls,ll=self._meta
+  for s,o,l in zip(m.smp,offs,lens):s.data=b[o:o+l]
+  m._bk=(b,offs,lens,ls,ll)
+
+ def attach(self):
+  """Return a Mod whose sample data are read-only views of the segment."""
+  if self._pid!=os.getpid():                         # new here (fork copies the owner's)
+   from multiprocessing import shared_memory
+   self._sm=shared_memory.SharedMemory(name=self.name)
+   with self._lk:self._rc()[0]+=1
+   self.mod=self._stub;self._bind(self.mod);self._pid=os.getpid()
+  return self.mod
+
+ def release(self):
+  """Drop this process's reference; the last one out unlinks the segment.
+  The attached Mod is left without sample data."""
+  if self._sm is None or self._pid!=os.getpid():return
+  with self._lk:
+   self._rc()[0]-=1;last=self._rc()[0]<=0
+  for s in self.mod.smp:s.data=np.zeros(0,dtype=np.float32)
+  self.mod._bk=None
+  if self.mod is self._stub:self.mod=None            # worker may attach() again
+  self._pid=None
+  try:self._sm.close()
+  except BufferError:pass                            # views still alive elsewhere
+  if last:
+   try:self._sm.unlink()
+   except FileNotFoundError:pass
+  self._sm=None
 
 # ── sample converters ─────────────────────────────────────────────────────────
 def _u8f(r):(np.frombuffer(r,dtype=np.uint8).astype(np.float32)-128)/128
@@ -78,6 +240,195 @@ _u8f=lambda r:(np.frombuffer(r,dtype=np.uint8).astype(np.float32)-128.0)/128.0
 _s8f=lambda r:np.frombuffer(r,dtype=np.int8).astype(np.float32)/128.0
 _s16f=lambda r:np.frombuffer(r,dtype='<i2').astype(np.float32)/32768.0
 
+def _it_unpack(data,off,n,is16,it215):
+ """Decode an IT 2.14/2.15 compressed sample of n samples at data[off].
+ Fixed-width runs are pulled out of a 32-bit bit window in bulk and
+ scanned for width-change markers, so Python only loops per width change."""
+ top=17 if is16 else 9;sb=top-1;bsz=0x4000 if is16 else 0x8000
+ hb=4 if is16 else 3;bw=16 if is16 else 8;h=1<<sb-1;msk=(1<<sb)-1
+ n=min(n,max(0,len(data)-off)*8)       # fields are at least 1 bit: n is untrusted
+ out=np.zeros(n,dtype=np.float32);done=0
+ while done<n and off+2<=len(data):
+  cl=struct.unpack_from('<H',data,off)[0];off+=2
+  blk=np.frombuffer(data[off:off+cl]+b'\0'*4,dtype=np.uint8).astype(np.uint32);off+=cl
+  win=blk[:-3]|(blk[1:-2]<<8)|(blk[2:-1]<<16)|(blk[3:]<<24)
+  nb=(len(blk)-4)*8;cnt=min(bsz,n-done);vals=[];got=0;p=0;w=top   # cl may overrun the file
+  while got<cnt and p+w<=nb:
+   k=min(cnt-got,(nb-p)//w,512)
+   bp=p+w*np.arange(k,dtype=np.int64)
+   v=((win[bp>>3]>>(bp&7).astype(np.uint32))&((1<<w)-1)).astype(np.int64)
+   if w<7:mk=v==1<<(w-1)
+   elif w<top:bd=(msk>>(top-w))-bw//2;mk=(v>bd)&(v<=bd+bw)
+   else:mk=(v&(1<<sb))!=0
+   j=int(np.argmax(mk)) if mk.any() else k
+   if j:
+    sx=min(w,sb);x=v[:j]&((1<<sx)-1)
+    vals.append(x-((x>>(sx-1))<<sx));got+=j
+   p+=w*j
+   if j==k:continue
+   # width change marker at field j
+   p+=w
+   if w<7:
+    if p+hb>nb:break
+    nw=int((win[p>>3]>>(p&7))&((1<<hb)-1))+1;p+=hb
+   elif w<top:nw=int(v[j])-bd
+   else:w=(int(v[j])+1)&0xFF;nw=0
+   if nw:w=nw if nw<w else nw+1
+   if not 1<=w<=top:break
+  if vals:
+   # deltas (and IT2.15 double deltas) wrap at the sample width
+   d=((np.cumsum(np.concatenate(vals))+h)&msk)-h
+   if it215:d=((np.cumsum(d)+h)&msk)-h
+   out[done:done+len(d)]=d/float(h)
+  done+=cnt
+ return out
+
+# ── envelopes ─────────────────────────────────────────────────────────────────
+def _env(pts,sus=None,loop=None,lo=0.0,sc=1/64):
+ """Env from (tick,value) nodes, interpolated to one value per tick and
+ mapped by (value-lo)*sc; sus/loop are (first,last) node indices or None."""
+ t=[];y=[]
+ for x,v in pts:
+  if t and x<=t[-1]:break   # nodes must advance in time
+  t.append(x);y.append(v)
+ if not t:return None
+ def tk(rg):return(t[rg[0]],t[rg[1]]) if rg and rg[0]<=rg[1]<len(t) else(-1,-1)
+ e=Env();e.o=0
+ e.v=((np.interp(np.arange(t[-1]+1),t,y)-lo)*sc).astype(np.float32)
+ e.sb,e.se=tk(sus);e.lb,e.le=tk(loop)
+ return e
+
+def _fade(fsp):
+ """Fadeout as a per-tick gain table; past its end the last entry holds."""
+ if fsp<=0:return np.ones(1,dtype=np.float32)
+ return np.maximum(0.0,1.0-np.arange(int(math.ceil(1/fsp))+1)*fsp).astype(np.float32)
+
+def _xm_env(w,n,f,s,lb,le,lo,sc):
+ """XM envelope: w = 12 (tick,value) word pairs, f = type (1 on, 2 sustain, 4 loop)."""
+ if not f&1 or not n:return None
+ return _env([(w[2*k],w[2*k+1]) for k in range(min(n,12))],(s,s) if f&2 else None,(lb,le) if f&4 else None,lo,sc)
+
+def _it_env(data,o,pan):
+ """IT envelope at o: Flg,Num,LpB,LpE,SLB,SLE then 25 (value,tick word) nodes."""
+ f,n,lb,le,sb,se=data[o:o+6]
+ if not f&1 or not n:return None
+ pts=[]
+ for k in range(min(n,25)):
+  y=data[o+6+k*3];pts.append((struct.unpack_from('<H',data,o+7+k*3)[0],y-256 if pan and y>127 else y))
+ return _env(pts,(sb,se) if f&4 else None,(lb,le) if f&2 else None,0,1/32 if pan else 1/64)
+
+# ── pattern unpackers ─────────────────────────────────────────────────────────
+# Packed patterns are walked once to find where each cell starts (reading only
+# control/mask bytes), then every field is gathered at once with numpy.
+# Cell lengths by control byte (S3M, XM) or mask (IT, excluding the mask byte):
+_S3L=[1+2*(b>>5&1)+(b>>6&1)+2*(b>>7&1) for b in range(256)]
+_XML=[1+bin(b&31).count('1') if b&128 else 5 for b in range(256)]
+_ITL=[(m&1)+(m>>1&1)+(m>>2&1)+2*(m>>3&1) for m in range(256)]
+
+def _at(u,o,h,d):
+ """u[o] where h holds, else d (o may point past the end where h is False)."""
+ return np.where(h,u[np.minimum(o,len(u)-1)].astype(np.int64),d)
+
+def _last(c,h):
+ """For each cell (c = its channel, in stream order): index of the latest
+ cell of the same channel, itself included, where h holds; -1 if none."""
+ o=np.argsort(c,kind='stable');k=np.arange(len(c))
+ j=np.maximum.accumulate(np.where(h[o],k,-1))
+ cs=c[o];j=np.where(j>=np.searchsorted(cs,cs),j,-1)   # not from another channel
+ r=np.empty_like(k);r[o]=np.where(j>=0,o[np.maximum(j,0)],-1)
+ return r
+
+def _cells(u,Q):
+ """Control byte positions Q (0 = end of row) -> positions, rows and control
+ bytes of the cells."""
+ Q=np.array(Q,dtype=np.int64);b=u[Q].astype(np.int64);z=b==0
+ k=~z;return Q[k],(np.cumsum(z)-z)[k],b[k]
+
+def _fit(i,end,ws):
+ """End of a cell that runs past end: fields of widths ws that don't fit are
+ skipped, the following ones are still read."""
+ for w in ws:
+  if i+w<=end:i+=w
+ return i
+
+def _rows(a,nr,nc):
+ """(nr*nc,5) cell array -> nr lists of nc (note,ins,vol,eff,prm) tuples."""
+ z=list(zip(*a.T.tolist()))
+ return[z[i*nc:(i+1)*nc] for i in range(nr)]
+
+def _unpack_s3m(data,u,pp):
+ """S3M pattern at parapointer pp: 64 rows of 32 cells (None = empty) and
+ the set of channels used."""
+ n=len(data);i=pp+2;row=0;Q=[];q=Q.append
+ while row<64 and i<n:
+  b=data[i];q(i)
+  if b==0:row+=1;i+=1;continue
+  k=i+_S3L[b]
+  i=k if k<=n else _fit(i+1,n,[w for f,w in((32,2),(64,1),(128,2)) if b&f])
+ pat=[[None]*32 for _ in range(64)]
+ p,R,b=_cells(u,Q)
+ if not len(p):return pat,set()
+ # a field is read only if all its bytes are there; later fields shift down
+ o=p+1;h=((b&0x20)>0)&(o+1<n);note=_at(u,o,h,0);ins=_at(u,o+1,h,0)
+ o=o+2*h;h=((b&0x40)>0)&(o<n);vol=_at(u,o,h,-1)
+ o=o+h;h=((b&0x80)>0)&(o+1<n);eff=_at(u,o,h,0);prm=_at(u,o+1,h,0)
+ ch=(b&0x1F).tolist()
+ for r,c,cell in zip(R.tolist(),ch,zip(note.tolist(),ins.tolist(),vol.tolist(),eff.tolist(),prm.tolist())):
+  pat[r][c]=cell
+ return pat,set(ch)
+
+def _unpack_xm(data,u,off,end,nr,nc):
+ """XM pattern packed in data[off:end]: nr rows of nc cells. A cell with
+ bit 7 set lists its fields in bits 0-4, otherwise it is 5 plain bytes."""
+ end=min(end,len(data));i=off;P=[]
+ for _ in range(nr*nc):
+  if i>=end:break
+  b=data[i];P.append(i);k=i+_XML[b]
+  i=k if k<=end or b&128 else i+2   # short plain cell: only ins is read
+ a=np.zeros((nr*nc,5),dtype=np.int64);a[:,2]=0xFF
+ if P:
+  p=np.array(P);b=u[p].astype(np.int64);k=(b&0x80)>0;full=p+5<=end
+  o=p+1;h=((b&1)>0)&(o<end);cols=[np.where(k,_at(u,o,k&h,0),b)];o=o+h
+  for j,(bit,d) in enumerate(((2,0),(4,0xFF),(8,0),(16,0))):
+   h=((b&bit)>0)&(o<end)
+   cols.append(_at(u,np.where(k,o,p+1+j),np.where(k,h,(p+1<end) if j==0 else full),d))
+   o=o+h
+  a[:len(p)]=np.stack(cols,1)
+ return _rows(a,nr,nc)
+
+def _unpack_it(data,u,off,end,nr):
+ """IT pattern packed in data[off:end]: nr rows of 64 cells. Masks and the
+ note/ins/vol/effect values they mark as repeated come from the latest cell
+ of the same channel that stored them (IT mask memory)."""
+ end=min(end,len(data));lm=[0]*64;i=off;row=0;Q=[];q=Q.append
+ while row<nr and i<end:
+  b=data[i];q(i);i+=1
+  if b==0:row+=1;continue
+  ch=(b-1)&63
+  if b&128 and i<end:lm[ch]=data[i];i+=1
+  m=lm[ch];k=i+_ITL[m]
+  i=k if k<=end else _fit(i,end,[w for f,w in((1,1),(2,1),(4,1),(8,2)) if m&f])
+ a=np.zeros((nr*64,5),dtype=np.int64);a[:,0]=a[:,2]=0xFF
+ p,R,b=_cells(u,Q)
+ if not len(p):return _rows(a,nr,64)
+ c=(b-1)&63;h=((b&128)>0)&(p+1<end)          # cells that set a new mask
+ j=_last(c,h);m=np.where(j>=0,_at(u,p+1,h,0)[np.maximum(j,0)],0)
+ o=p+1+h;cols=[]
+ for bit,rep,d in((1,16,0xFF),(2,32,0),(4,64,0xFF),(8,128,0)):
+  w=2 if bit==8 else 1
+  h=((m&bit)>0)&(o+w-1<end)                 # value stored in this cell
+  j=_last(c,h);j=np.where((m&(bit|rep))>0,j,-1)   # cell the value comes from
+  v=_at(u,o,h,0)
+  v=np.where(j>=0,v[np.maximum(j,0)],d)
+  if bit==1:v=np.where((v==255)&((m&17)>0),253,v)   # note off (0xFF = empty)
+  cols.append(v)
+  if bit==8:cols.append(np.where(j>=0,_at(u,o+1,h,0)[np.maximum(j,0)],0))
+  o=o+h*w
+ key=R*64+c
+ _,ix=np.unique(key[::-1],return_index=True);ix=len(key)-1-ix   # last write wins
+ a[key[ix]]=np.stack(cols,1)[ix]
+ return _rows(a,nr,64)
+
 # ── loaders ───────────────────────────────────────────────────────────────────
 def _load_mod(data):
  m=Mod();m.fmt='MOD';m.linear=False
@@ -159,20 +510,10 @@ def _load_s3m(data):
     elif signed_smp:s.data=_s8f(raw)
     else:s.data=_u8f(raw)
   m.smp.append(s)
- cset=set()
+ cset=set();u=np.frombuffer(data,dtype=np.uint8)
  for pp in ppat:
   pat=[[None]*32 for _ in range(64)]
-  if pp and pp+2<=len(data):
-   off=pp+2;row=0
-   while row<64 and off<len(data):
-    b=data[off];off+=1
-    if b==0:row+=1;continue
-    ch=b&0x1F;cset.add(ch)
-    note=ins=eff=prm=0;vol=-1
-    if b&0x20 and off+1<len(data):note=data[off];ins=data[off+1];off+=2
-    if b&0x40 and off<len(data):vol=data[off];off+=1
-    if b&0x80 and off+1<len(data):eff=data[off];prm=data[off+1];off+=2
-    if row<64 and ch<32:pat[row][ch]=(note,ins,vol,eff,prm)
+  if pp and pp+2<=len(data):pat,cs=_unpack_s3m(data,u,pp);cset|=cs
   m.pats.append(pat)
  m.nc=max(cset)+1 if cset else 4
  return m
@@ -190,6 +531,7 @@ def _load_xm(data):
  m.bpm=max(32,struct.unpack_from('<H',data,78)[0])
  m.orders=list(data[80:80+256])[:m.sl]
  off=60+hs  # patterns start here
+ u=np.frombuffer(data,dtype=np.uint8)
  # -- patterns --
  for _ in range(np2):
   if off+9>len(data):break
@@ -201,26 +543,7 @@ def _load_xm(data):
   pat=[]
   if pdsize==0:
    for _ in range(nrows):pat.append([(0,0,0xFF,0,0)]*m.nc)
-  else:
-   raw=data[pdata_off:pdata_off+pdsize];ri=0
-   for _ in range(nrows):
-    row=[]
-    for _ in range(m.nc):
-     if ri>=len(raw):row.append((0,0,0xFF,0,0));continue
-     b=raw[ri];ri+=1;note=ins=eff=prm=0;vol=0xFF
-     if b&0x80:
-      if b&1 and ri<len(raw):note=raw[ri];ri+=1
-      if b&2 and ri<len(raw):ins=raw[ri];ri+=1
-      if b&4 and ri<len(raw):vol=raw[ri];ri+=1
-      if b&8 and ri<len(raw):eff=raw[ri];ri+=1
-      if b&16 and ri<len(raw):prm=raw[ri];ri+=1
-     else:
-      # uncompressed: note byte followed by 4 more
-      note=b
-      if ri+4<=len(raw):ins,vol,eff,prm=raw[ri],raw[ri+1],raw[ri+2],raw[ri+3];ri+=4
-      elif ri<len(raw):ins=raw[ri];ri+=1
-     row.append((note,ins,vol,eff,prm))
-    pat.append(row)
+  else:pat=_unpack_xm(data,u,pdata_off,pdata_off+pdsize,nrows,m.nc)
   m.pats.append(pat)
  # -- instruments --
  for _ in range(ni):
@@ -228,6 +551,16 @@ def _load_xm(data):
   istart=off
   isz=struct.unpack_from('<I',data,istart)[0]
   nsmp=struct.unpack_from('<H',data,istart+27)[0] if istart+28<=len(data) else 0
+  ins=Ins();ins.name=data[istart+4:istart+26].rstrip(b'\x00').decode('latin-1',errors='replace')
+  if nsmp and isz>=241 and istart+241<=len(data):
+   # +129: vol then pan envelope (12 tick/value word pairs each), +225: point
+   # counts, sustain/loop points, types; +239: fadeout (of 32768 per tick)
+   w=struct.unpack_from('<48H',data,istart+129)
+   nv,npn,vs,vlb,vle,ps,plb,ple,vt,pt=data[istart+225:istart+235]
+   ins.venv=_xm_env(w[:24],nv,vt,vs,vlb,vle,0,1/64)
+   ins.penv=_xm_env(w[24:],npn,pt,ps,plb,ple,32,1/32)
+   ins.fade=struct.unpack_from('<H',data,istart+239)[0];ins.fsp=ins.fade/32768.0;ins.ftab=_fade(ins.fsp)
+  m.ins.append(ins)
   # sample headers follow at istart+isz (the full instrument header size)
   shdr_off=istart+max(isz,29)
   if nsmp==0:
@@ -301,17 +634,25 @@ def _load_it(data):
  smp_p=[struct.unpack_from('<I',data,base2+i*4)[0] for i in range(ns_)]
  base3=base2+ns_*4
  pat_p=[struct.unpack_from('<I',data,base3+i*4)[0] for i in range(np2)]
- m.nc=64
+ m.nc=64;fk=None
  # -- instruments --
  for pp in ins_p:
   ntbl=[0]*120  # 0=no sample; 1-based sample number otherwise
+  ins=Ins()
   if pp and pp+0x140<=len(data) and data[pp:pp+4]==b'IMPI':
+   # +0x11: NNA, +0x14: FadeOut(2), +0x20: name (26 bytes)
+   ins.nna=data[pp+0x11]&3
+   ins.fade=struct.unpack_from('<H',data,pp+0x14)[0]
+   ins.name=data[pp+0x20:pp+0x3A].rstrip(b'\x00').decode('latin-1',errors='replace')
+   ins.fsp=ins.fade/1024.0;ins.ftab=_fade(ins.fsp)
+   if pp+0x1D4<=len(data):   # +0x130: volume envelope, +0x182: panning envelope
+    ins.venv=_it_env(data,pp+0x130,False);ins.penv=_it_env(data,pp+0x182,True)
    # Note-sample/keyboard table at pp+0x40: 120 pairs of (note, sample)
    # note: 0-119 (C-0 to B-9), sample: 1-99 (1-based), 0=no sample
    for j in range(120):
     idx=pp+0x40+j*2
     if idx+1<len(data):ntbl[j]=data[idx+1]   # sample number (1-based)
-  m.ntbl.append(ntbl)
+  m.ntbl.append(ntbl);m.ins.append(ins)
  # -- samples --
  for pp in smp_p:
   s=Smp()
@@ -331,7 +672,6 @@ def _load_it(data):
    # fold global vol into sample vol
    s.vol=min(64,vol*gvl//64) if gvl<64 else min(64,vol)
    if not(flg&1):m.smp.append(s);continue   # no sample data associated
-   if flg&8:m.smp.append(s);continue         # compressed - not supported here
    slen=struct.unpack_from('<I',data,pp+0x30)[0] if pp+0x34<=len(data) else 0
    lb=struct.unpack_from('<I',data,pp+0x34)[0] if pp+0x38<=len(data) else 0
    le=struct.unpack_from('<I',data,pp+0x38)[0] if pp+0x3C<=len(data) else 0
@@ -341,7 +681,14 @@ def _load_it(data):
    # Cvt bit0: 0=unsigned, 1=signed; bit2: 0=PCM, 1=delta
    signed_s=bool(cvt&1);delta=bool(cvt&4)
    s.ls=lb//nb;s.ll=(le-lb)//nb if has_loop and le>lb else 0
-   if slen>0 and dp>0 and dp+slen*nb<=len(data):
+   if flg&8:                                 # IT2.14 compressed (Cvt bit2: 2.15)
+    s.ll=le-lb if has_loop and le>lb else 0;s.ls=lb
+    if slen>0 and 0<dp<len(data):
+     fk=fk or _fkey(data);ck=f'{fk}-{pp:x}'
+     s.data=_cget('it214',ck)
+     if s.data is None:
+      s.data=_it_unpack(data,dp,slen,is16,delta);_cput('it214',ck,s.data)
+   elif slen>0 and dp>0 and dp+slen*nb<=len(data):
     raw=data[dp:dp+slen*nb]
     if delta:
      if is16:
@@ -358,58 +705,77 @@ def _load_it(data):
      else:s.data=_u8f(raw)
   m.smp.append(s)
  # -- patterns --
+ u=np.frombuffer(data,dtype=np.uint8)
  for pp in pat_p:
   nrows=64
   pat=[]
   if pp and pp+8<=len(data):
    plen=struct.unpack_from('<H',data,pp)[0]
    nrows=min(max(1,struct.unpack_from('<H',data,pp+2)[0]),200)
-   rd=data[pp+8:pp+8+plen];ri=0;row=0
-   lm=[0]*64;ln=[0xFF]*64;li=[0]*64;lv=[0xFF]*64;le2=[0]*64;lp=[0]*64
-   cur=[[0xFF,0,0xFF,0,0] for _ in range(64)]  # [note,ins,vol,eff,prm]
-   rows=[]
-   while row<nrows and ri<len(rd):
-    b=rd[ri];ri+=1
-    if b==0:
-     rows.append([tuple(cur[ch]) for ch in range(64)])
-     # reset current row
-     cur=[[0xFF,0,0xFF,0,0] for _ in range(64)]
-     row+=1;continue
-    ch=(b-1)&63
-    if b&128 and ri<len(rd):lm[ch]=rd[ri];ri+=1
-    mask=lm[ch]
-    # note
-    if mask&1 and ri<len(rd):ln[ch]=rd[ri];ri+=1
-    if mask&16:pass   # reuse last note (already in ln[ch])
-    note=ln[ch] if (mask&1 or mask&16) else 0xFF
-    # instrument
-    if mask&2 and ri<len(rd):li[ch]=rd[ri];ri+=1
-    ins=li[ch] if (mask&2 or mask&32) else 0
-    # vol
-    if mask&4 and ri<len(rd):lv[ch]=rd[ri];ri+=1
-    vol=lv[ch] if (mask&4 or mask&64) else 0xFF
-    # eff
-    if mask&8 and ri+1<len(rd):le2[ch]=rd[ri];lp[ch]=rd[ri+1];ri+=2
-    eff=le2[ch] if (mask&8 or mask&128) else 0
-    prm=lp[ch] if (mask&8 or mask&128) else 0
-    cur[ch]=[note,ins,vol,eff,prm]
-   # flush remaining rows
-   while row<nrows:
-    rows.append([tuple(cur[ch]) for ch in range(64)])
-    cur=[[0xFF,0,0xFF,0,0] for _ in range(64)]
-    row+=1
-   pat=rows
+   pat=_unpack_it(data,u,pp+8,pp+8+plen,nrows)
   else:
    pat=[([(0xFF,0,0xFF,0,0)]*64) for _ in range(nrows)]
   m.pats.append(pat)
  return m
 
+LOADERS={'.mod':_load_mod,'.s3m':_load_s3m,'.xm':_load_xm,'.it':_load_it}
+
+# ── archives ──────────────────────────────────────────────────────────────────
+def _arc_split(path):
+ """('pack.zip','dir/song.mod') for a path inside an archive, else None."""
+ p=Path(path)
+ for a in p.parents:
+  if a.suffix.lower() in ARCS and a.is_file():return str(a),p.relative_to(a).as_posix()
+ return None
+
+_ARCD={}   # central directories already read by this process
+
+def _arc_dir(arc):
+ """Central directory of a ZIP as a structured array (name, offset of the
+ local header, packed size, size, method), cached on disk by path, size and
+ mtime so a big pack is only scanned once."""
+ st=os.stat(arc);ck=_fkey(f'{os.path.abspath(arc)}|{st.st_size}|{st.st_mtime_ns}'.encode())
+ d=_ARCD.get(ck)
+ if d is None:d=_cget('zipdir',ck)
+ if d is not None:_ARCD[ck]=d;return d
+ import zipfile
+ with zipfile.ZipFile(arc) as z:
+  il=[i for i in z.infolist() if not i.is_dir() and not i.flag_bits&1]
+ d=np.array([(i.filename,i.header_offset,i.compress_size,i.file_size,i.compress_type) for i in il],
+            dtype=[('name',f'U{max([len(i.filename) for i in il]+[1])}'),('off','i8'),('cs','i8'),('us','i8'),('m','i4')])
+ _cput('zipdir',ck,d);_ARCD[ck]=d
+ return d
+
+def _arc_list(arc):
+ """Module members of an archive, as 'pack.zip/member' paths."""
+ try:d=_arc_dir(arc)
+ except Exception:return []
+ return sorted(f'{arc}/{n}' for n in d['name'] if Path(n).suffix.lower() in EXTS)
+
+def _arc_read(arc,name):
+ """Member bytes, read straight from the archive: stored and deflated
+ members via the cached directory, anything else through zipfile."""
+ d=_arc_dir(arc);e=d[d['name']==name]
+ if not len(e):raise FileNotFoundError(f'{name} not in {arc}')
+ e=e[0]
+ if e['m'] in(0,8):
+  with open(arc,'rb') as f:
+   f.seek(int(e['off']));h=f.read(30)
+   if h[:4]==b'PK\x03\x04':
+    nl,xl=struct.unpack_from('<HH',h,26);f.seek(nl+xl,1)
+    raw=f.read(int(e['cs']))
+    if e['m']==0:return raw
+    import zlib
+    return zlib.decompress(raw,-15)
+ import zipfile
+ with zipfile.ZipFile(arc) as z:return z.read(name)
+
 def load(path):
- data=Path(path).read_bytes();ext=Path(path).suffix.lower()
- if ext=='.s3m':return _load_s3m(data)
- if ext=='.xm':return _load_xm(data)
- if ext=='.it':return _load_it(data)
- return _load_mod(data)
+ a=_arc_split(path) if not os.path.isfile(path) else None
+ data=_arc_read(*a) if a else Path(path).read_bytes();ext=Path(path).suffix.lower()
+ m=LOADERS.get(ext,_load_mod)(data)
+ m.fk=_fkey(data)
+ return m
 
 # ── frequency helpers ─────────────────────────────────────────────────────────
 
@@ -465,16 +831,18 @@ def _it_freq(note,c5):
  return float(c5)*2.0**((note-60)/12.0)
 
 # ── mixer ─────────────────────────────────────────────────────────────────────
-def _mix(c,mod,n):
- """Mix n output samples from channel c. Returns float32 array or None."""
+def _mix(c,mod,n,out=None,interp='linear',sr=SR):
+ """Resample n output samples at rate sr from channel c (unscaled: volume and
+ pan are applied by the caller's gain pair). Writes into out if given.
+ interp: 'nearest', 'linear' or 'cubic'. Returns the float32 array or None."""
  if not c.on or not c.snum or c.freq<=0:return None
  if c.snum>=len(mod.smp):return None
  s=mod.smp[c.snum];d=s.data;dl=len(d)
  if not dl:return None
- vol=c.vol/64.0;step=c.freq/SR
+ step=c.freq/sr
  ll=s.ll;ls=s.ls;le=ls+ll
  loop=ll>2 and le<=dl
- out=np.zeros(n,np.float32)
+ if out is None:out=np.empty(n,np.float32)
  pos=c.pos;wr=0
  while wr<n:
   rem=n-wr
@@ -489,30 +857,175 @@ def _mix(c,mod,n):
   if loop:idx=ls+np.mod(idx-ls,ll)
   else:idx=np.clip(idx,0.0,dl-1.0001)
   ip=idx.astype(np.int32)
-  ip1=np.minimum(ip+1,dl-1)
-  frac=(idx-ip).astype(np.float32)
-  chunk=(d[ip]+frac*(d[ip1]-d[ip]))*vol
+  if interp=='nearest':chunk=d[ip]
+  else:
+   # neighbours wrap at the loop seam, else clamp to the sample
+   if loop:nb=lambda k:np.where(k>=le,k-ll,np.where(k<ls,k+ll,k))
+   else:nb=lambda k:np.clip(k,0,dl-1)
+   frac=(idx-ip).astype(np.float32)
+   x0=d[ip];x1=d[nb(ip+1)]
+   if interp=='cubic':
+    xm=d[nb(ip-1)];x2=d[nb(ip+2)]
+    c2=xm-2.5*x0+2.0*x1-0.5*x2;c3=0.5*(x2-xm)+1.5*(x0-x1)
+    chunk=((c3*frac+c2)*frac+0.5*(x1-xm))*frac+x0
+   else:chunk=x0+frac*(x1-x0)
   end=min(wr+av,n)
-  out[wr:end]+=chunk[:end-wr]
+  out[wr:end]=chunk[:end-wr]
   pos+=av*step;wr=end
   if not loop and pos>=dl:c.on=False;break
+ if wr<n:out[wr:]=0
  c.pos=pos
  return out
 
+class VPool:
+ """Bounded pool of IT background (NNA) voices.
+ Kept as parallel arrays so all voices mix in one batched gather."""
+ __slots__=('n','act','snum','pos','step','amp','lg','rg','fade','fsp','age','key','_clk','steal','sr',
+            'ev','eo','ep','env','rel','fon')
+ def __init__(self,n=MAXVOICES,steal=VSTEAL,sr=SR):
+  self.n=n;self.steal=steal;self.sr=sr;self._clk=0
+  self.act=np.zeros(n,dtype=bool);self.snum=np.zeros(n,dtype=np.int64)
+  self.pos=np.zeros(n);self.step=np.zeros(n);self.age=np.zeros(n,dtype=np.int64)
+  self.amp=np.zeros(n,dtype=np.float32);self.fade=np.zeros(n,dtype=np.float32)
+  self.lg=np.zeros(n,dtype=np.float32);self.rg=np.zeros(n,dtype=np.float32)
+  self.fsp=np.zeros(n,dtype=np.float32);self.key=np.zeros(n,dtype=np.int64)
+  # volume envelope: value, Mod.etab() offset (-1 = none), tick, and
+  # (sustain start/end, loop start/end, last tick); released, fading
+  self.ev=np.ones(n,dtype=np.float32);self.eo=np.zeros(n,dtype=np.int64)
+  self.ep=np.zeros(n,dtype=np.int64);self.env=np.zeros((n,5),dtype=np.int64)
+  self.rel=np.zeros(n,dtype=bool);self.fon=np.zeros(n,dtype=bool)
+
+ def reset(self):self.act[:]=False
+
+ def add(self,c,fsp=0.0,key=0,rel=False,fon=None):
+  """Move channel c's current note into the background; steal if full.
+  key tags the voice for stem export; rel releases its envelope's sustain;
+  fon: fade by fsp per tick from now (default), else once the envelope ends."""
+  if not self.n:return
+  free=np.flatnonzero(~self.act)
+  if len(free):i=free[0]
+  elif self.steal=='age':i=int(np.argmin(self.age))
+  else:i=int(np.lexsort((self.age,self.amp*self.ev*self.fade))[0])
+  pan=min(1.0,(c.pan+c.epn*(128-abs(c.pan-128)))/255.0)
+  self.act[i]=True;self.snum[i]=c.snum;self.pos[i]=c.pos;self.step[i]=c.freq/self.sr
+  self.amp[i]=c.vol/64.0;self.fade[i]=c.fv;self.fsp[i]=fsp
+  self.lg[i]=math.sqrt(max(0.0,1.0-pan));self.rg[i]=math.sqrt(pan)
+  self.age[i]=self._clk;self._clk+=1;self.key[i]=key
+  e=c.ei.venv if c.ei else None
+  self.ev[i]=c.ev;self.rel[i]=rel;self.fon[i]=fsp>0 and(fon is None or fon)
+  if e:self.eo[i]=e.o;self.ep[i]=c.vep;self.env[i]=(e.sb,e.se,e.lb,e.le,len(e.v)-1)
+  else:self.eo[i]=-1
+
+ def tick(self,et=None):
+  """Advance envelopes (looked up in et, see Mod.etab) and fadeouts by one
+  tick; fully faded voices are released."""
+  i=np.flatnonzero(self.act&(self.eo>=0))
+  if len(i):
+   p=self.ep[i];sb,se,lb,le,last=self.env[i].T
+   self.ev[i]=et[self.eo[i]+p];p=p+1
+   w=~self.rel[i]&(se>=0)&(p>se)
+   self.ep[i]=p=np.where(w,sb,np.where((le>=0)&(p>le),lb,np.minimum(p,last)))
+   self.fon[i]|=self.rel[i]&(p>=last)&(self.fsp[i]>0)
+  f=self.act&self.fon
+  if not f.any():return
+  self.fade[f]-=self.fsp[f]
+  self.act[f&(self.fade<=0)]=False
+
+ def mix(self,mod,n,o,sc=1.0,stem=None):
+  """Add n samples of every active voice into the (n,2) buffer o, always
+  with linear interpolation (Player.interp applies to channels only).
+  stem(key,(n,2) array) also receives each voice's share, if given."""
+  a=np.flatnonzero(self.act)
+  if not len(a):return
+  d,offs,lens,lss,lls=mod.bank()
+  sn=self.snum[a];dl=lens[sn];ls=lss[sn];ll=lls[sn];lp=ll>0
+  idx=self.pos[a,None]+np.arange(n,dtype=np.float64)*self.step[a,None]
+  le=(ls+ll)[:,None]
+  idx=np.where(lp[:,None]&(idx>=le),ls[:,None]+np.mod(idx-ls[:,None],np.where(lp,ll,1.0)[:,None]),idx)
+  live=idx<dl[:,None]
+  idx=np.minimum(idx,(dl-1.0001)[:,None])
+  ip=idx.astype(np.int64)
+  frac=(idx-ip).astype(np.float32)
+  ip1=np.where(lp[:,None]&(ip+1>=le),ip+1-ll[:,None],np.minimum(ip+1,(dl-1)[:,None])).astype(np.int64)
+  ip+=offs[sn,None];ip1+=offs[sn,None]
+  v=(d[ip]+frac*(d[ip1]-d[ip]))*live
+  g=self.amp[a]*self.ev[a]*self.fade[a]*sc
+  G=np.stack((g*self.lg[a],g*self.rg[a]),1)
+  o+=v.T@G
+  if stem:
+   for j,k in enumerate(self.key[a]):stem(int(k),v[j,:,None]*G[j])
+  pos=self.pos[a]+n*self.step[a]
+  pos=np.where(lp&(pos>=ls+ll),ls+np.mod(pos-ls,np.where(lp,ll,1.0)),pos)
+  self.pos[a]=pos
+  self.act[a[~lp&(pos>=dl)]]=False
+
+# ── row render cache ──────────────────────────────────────────────────────────
+class RowCache:
+ """Memoized PCM of whole rows, keyed on the player state at the row's
+ start (see Player._mkey), with the state at its end. LRU within budget bytes."""
+ def __init__(self,budget):
+  from collections import OrderedDict
+  self.budget=budget;self.size=0;self.hits=self.miss=0;self._d=OrderedDict()
+ def get(self,k):
+  v=self._d.get(k)
+  if v is None:self.miss+=1;return None
+  self._d.move_to_end(k);self.hits+=1;return v
+ def put(self,k,pcm,end):
+  if k in self._d or pcm.nbytes>self.budget:return
+  self._d[k]=(pcm,end);self.size+=pcm.nbytes
+  while self.size>self.budget:self.size-=self._d.popitem(last=False)[1][0].nbytes
+
 # ── player ────────────────────────────────────────────────────────────────────
 class Player:
- def __init__(self,mod):
+ def __init__(self,mod,voices=MAXVOICES,steal=VSTEAL,direct=False,threads=None,norm=None,
+              sr=None,interp=None,memo=None):
   self.mod=mod;self.nc=mod.nc
+  self.sr=sr or SR;self.interp=interp or INTERP   # output rate, resampler
   self.ch=[Trk() for _ in range(mod.nc)]
+  self._vp=VPool(voices,steal,self.sr)   # IT background voices (NNA)
   self.op=self.row=self.tick=self._tp=0
   self.spd=mod.spd;self.bpm=mod.bpm
   self._spt=self._gspt()
   self.playing=self.paused=self.ended=False
   self._lk=threading.Lock();self._st=None
   self._pb=self._pj=-1;self._lsr=self._lsc=0
-  self._q=queue.Queue(maxsize=QMAX);self._wt=None
+  # ring of QMAX block slots: worker renders into a free slot, _cb drains it
+  self._ring=np.zeros((QMAX,BLKSIZE,2),dtype=np.float32)
+  self._free=queue.Queue();self._q=queue.Queue();self._wt=None
+  for i in range(QMAX):self._free.put(i)
+  # playback snapshots (see _snapshot): one per ring slot, published as
+  # self.now when _cb plays that slot, so the UI shows what is being heard
+  self._snap=[None]*QMAX;self.now=None
+  self.direct=direct   # render inside the audio callback (no worker/ring)
+  self._sc=1.0/max(1,self.nc//4)   # mix headroom, folded into channel gains
+  self.gain=1.0   # per-file normalization gain from analyze(), if cached
+  if(NORM if norm is None else norm) and mod.fk:
+   g=_cget('gain',mod.fk)
+   if g is not None:self.gain=float(g[0]);self._sc*=self.gain
+  self.clip=True   # analysis renders unclipped
+  self._vb=np.empty((self.nc,BLKSIZE),dtype=np.float32)   # per-voice scratch
+  self._G=np.empty((self.nc,2),dtype=np.float32)          # per-voice L/R gains
+  # threaded mixing: channels dealt round-robin to T groups, each owning a
+  # block of scratch rows starting at lo and its own (n,2) accumulator
+  self.threads=T=max(1,MTHREADS if threads is None else threads)
+  self._parts=[];lo=0
+  for t in range(T):self._parts.append((lo,self.ch[t::T]));lo+=len(self.ch[t::T])
+  self._acc=np.empty((T,BLKSIZE,2),dtype=np.float32)
+  # stem export: None, 'channel' or 'ins'; per-block {key:(n,2)} in self.stems
+  self.stem=None;self.stems={}
+  # playlist: files, current index, preloaded next Player and its loader thread
+  self.plist=None;self._pi=0;self._nx=self._pt=None
+  self.length=None;self._done=0   # song length / frames rendered so far
+  # row memoization: cache, row being recorded [key,pcm,frames], replay (pcm,at,end)
+  m=MEMO if memo is None else memo
+  self._mc=RowCache(int(m*2**20)) if m else None;self._rec=self._rp=None
   self._ipan()
 
+ # song state handed over by _adopt(); stream, ring and flags stay put
+ _SONG=('mod','nc','ch','op','row','tick','_tp','spd','bpm','_spt','_pb','_pj',
+        '_lsr','_lsc','_vp','_sc','_vb','_G','_parts','_acc','ended','length',
+        '_done','_fp','_pi','_mc','_rec','_rp')
+
  def _ipan(self):
   if self.mod.fmt=='MOD':
    pans=[0,255,255,0]
@@ -520,9 +1033,18 @@ class Player:
   else:
    for c in self.ch:c.pan=128
 
+ def _pg(self,c):
+  """L/R gain of channel c; recomputed only when its pan, volume or
+  envelope/fade values change."""
+  k=(c.pan,c.vol,c.ev,c.fv,c.epn)
+  if c.gk!=k:
+   pan=min(1.0,(c.pan+c.epn*(128-abs(c.pan-128)))/255.0);v=c.vol/64.0*c.ev*c.fv*self._sc
+   c.gl=math.sqrt(max(0.0,1.0-pan))*v;c.gr=math.sqrt(pan)*v;c.gk=k
+  return c.gl,c.gr
+
  def _gspt(self):
   """Samples per tick at current BPM."""
-  return max(1,int(SR*60/(self.bpm*24)))
+  return max(1,int(self.sr*60/(self.bpm*24)))
 
  # ── note frequency helpers ──────────────────────────────────────────────────
 
@@ -548,14 +1070,49 @@ class Player:
   c.pos=0.0;c.vp=0;c.on=True
 
  def _trig(self,c,freq):
-  """Trigger non-MOD note: set freq and restart sample."""
+  """Trigger non-MOD note: set freq and restart sample (and envelopes)."""
   c.freq=freq;c.tfreq=freq
   c.pos=0.0;c.vp=0;c.on=True
+  c.vep=c.pep=0;c.fp=-1;c.held=True
   if self.mod.fmt=='S3M' and freq>0:
    c.s3mper=int(S3M_CLK/freq)
   elif self.mod.fmt in('XM','IT') and not self.mod.linear and freq>0:
    c.per=int(XM_APC/freq);c.bper=c.per
 
+ def _nna(self,c):
+  """IT New Note Action: hand the playing note of c to the voice pool."""
+  if not c.on or not c.ins or c.ins>len(self.mod.ins):return
+  ins=self.mod.ins[c.ins-1]
+  if ins.nna==0:return                 # cut: new note simply replaces it
+  if ins.venv:self.mod.etab()          # assigns the envelope's table offset
+  # off: release the envelope; fade now unless it has no loop and must end first
+  rel=ins.nna==2 or not c.held;e=ins.venv
+  fon=c.fp>=0 or ins.nna==3 or not e or e.le>=0
+  self._vp.add(c,ins.fsp if ins.nna>=2 or c.fp>=0 else 0.0,self._skey(self.ch.index(c),c),rel,fon)
+
+ def _envs(self):
+  """Advance channel envelopes and fadeouts by one tick. Curves are
+  precomputed per tick at load time (_env, _fade): this is index lookups."""
+  for c in self.ch:
+   i=c.ei
+   if i is None or not c.on:continue
+   e=i.venv
+   if e:
+    c.ev=float(e.v[c.vep]);c.vep=e.step(c.vep,c.held)
+    if not c.held and c.fp<0 and c.vep==len(e.v)-1:c.fp=0   # released env ended
+   else:c.ev=1.0                       # may be left over from the previous instrument
+   if c.fp>=0:
+    f=i.ftab;c.fv=float(f[min(c.fp,len(f)-1)]);c.fp+=1
+    if c.fp>=len(f) and not f[-1]:c.on=False
+   else:c.fv=1.0
+   e=i.penv
+   if e:c.epn=float(e.v[c.pep]);c.pep=e.step(c.pep,c.held)
+   else:c.epn=0.0
+
+ def _skey(self,i,c):
+  """Stem key of channel i: its index, or its instrument in 'ins' mode."""
+  return(c.ins or c.snum) if self.stem=='ins' else i
+
  # ── row 0 (new row processing) ──────────────────────────────────────────────
 
  def _row0(self):
@@ -648,7 +1205,7 @@ class Player:
     note,ins,vol,eff,prm=cell
     # Resolve instrument -> sample via note table
     if ins and 1<=ins<=len(self.mod.ntbl):
-     ntbl=self.mod.ntbl[ins-1]
+     ntbl=self.mod.ntbl[ins-1];c.ins=ins;c.ei=self.mod.ins[ins-1]
      n0=note-1 if note and 0<note<=96 else (c.snum-1 if c.snum else 0)
      n0=max(0,min(95,n0))
      sidx=ntbl[n0]
@@ -666,7 +1223,9 @@ class Player:
        else:c.ptgt=int(XM_APC/freq)
       else:
        self._trig(c,freq)
-    elif note==97:c.on=False          # key-off
+    elif note==97:                    # key-off: release envelopes (no vol env: cut)
+     if c.ei and c.ei.venv:c.held=False;c.fp=max(c.fp,0)
+     else:c.on=False
     # volume column
     if 0x10<=vol<=0x50:c.vol=vol-0x10
     elif 0x60<=vol<=0x6F:c.vol=max(0,c.vol-(vol&0xF))    # fine vol down
@@ -713,7 +1272,7 @@ class Player:
 
    elif fmt=='IT':
     note,ins,vol,eff,prm=cell
-    # IT note: 0xFF=no note, 0=C-0..119=B-9, 254=note cut, 255=note off
+    # IT note: 0xFF=no note, 0=C-0..119=B-9, 254=note cut, 253=note off
     if ins:
      if 1<=ins<=len(self.mod.ntbl):   # instrument mode
       sidx=0
@@ -721,7 +1280,8 @@ class Player:
        sidx=self.mod.ntbl[ins-1][note]  # ntbl indexed by note (0-based)
       elif c.snum:sidx=c.snum
       if sidx and sidx<len(self.mod.smp):
-       c.snum=sidx;c.vol=self.mod.smp[sidx].vol
+       if note<=119 and eff!=7:self._nna(c)
+       c.snum=sidx;c.vol=self.mod.smp[sidx].vol;c.ins=ins;c.ei=self.mod.ins[ins-1]
      elif ins<len(self.mod.smp):       # sample-only mode
       c.snum=ins;c.vol=self.mod.smp[ins].vol
     s=self.mod.smp[c.snum] if c.snum and c.snum<len(self.mod.smp) else None
@@ -729,9 +1289,13 @@ class Player:
      freq=_it_freq(note,s.c5 if s else 8363)
      if freq>0:
       if eff==7:c.ptgt=freq           # G = tone porta target
-      else:self._trig(c,freq)
+      else:
+       if not ins:self._nna(c)
+       self._trig(c,freq)
     elif note==254:c.on=False          # note cut
-    elif note==255:pass                 # note off (simplified: ignore envelopes)
+    elif note==253:                    # note off: release envelopes; fade
+     c.held=False                      # now unless the vol env must end first
+     if c.ei and(not c.ei.venv or c.ei.venv.le>=0):c.fp=max(c.fp,0)
     if vol!=0xFF:
      if vol<=64:c.vol=vol
      elif 65<=vol<=74:c.vol=min(64,c.vol+(vol-65))   # fine vol up
@@ -768,6 +1332,7 @@ class Player:
       elif self._lsc>0:
        self._lsc-=1
        if self._lsc:self._pb=self._lsr;self._pj=self.op
+  self._envs()
 
  # ── tick effects (ticks 1..speed-1) ─────────────────────────────────────────
 
@@ -880,6 +1445,7 @@ class Player:
     elif e==19:
      s2,a=p>>4,p&0xF
      if s2==0xC and t==a:c.vol=0
+  self._envs()
 
  # ── sequencer ────────────────────────────────────────────────────────────────
 
@@ -898,7 +1464,9 @@ class Player:
   if self.op>=self.mod.sl:self.ended=True
 
  def _atick(self):
+  if self._rec is not None and self.tick+1>=self.spd:self._mput()
   self.tick+=1
+  self._vp.tick(self.mod.etab())
   if self.tick>=self.spd:
    self.tick=0;self._nrow();self._row0()
   else:
@@ -906,58 +1474,146 @@ class Player:
 
  # ── audio generation ─────────────────────────────────────────────────────────
 
- def _gen_block(self,n):
-  if self.ended:return np.zeros((n,2),dtype=np.float32)
-  left=np.zeros(n,dtype=np.float32)
-  right=np.zeros(n,dtype=np.float32)
+ def _gen_block(self,n,out=None):
+  """Render n frames into out ((n,2) float32; allocated if None).
+  Active voices are resampled into rows of a scratch matrix and folded into
+  the interleaved output with one (chunk,k)@(k,2) gain-matrix product."""
+  if out is None:out=np.empty((n,2),dtype=np.float32)
+  out.fill(0)
+  if self.stem:self.stems={}
+  if(self.plist and self._pt is None and self.length is not None
+     and self.length-self._done<PRELOAD*self.sr):
+   self._pt=threading.Thread(target=self._preload,daemon=True);self._pt.start()
   tp=self._tp;pos=0
   while pos<n:
+   if self._nx is not None and(self.ended or self._done>=self.length):
+    self._adopt();tp=self._tp
+   if self.ended:break
+   if self._rp is not None:           # replaying a memoized row
+    b,k,end=self._rp;chunk=min(len(b)-k,n-pos)
+    out[pos:pos+chunk]=b[k:k+chunk];pos+=chunk;self._done+=chunk
+    if k+chunk<len(b):self._rp=(b,k+chunk,end);continue
+    self._rp=None;self._mset(end);tp=0;self._atick();continue
+   if tp==0 and self.tick==0 and self._mc is not None and self._rec is None:
+    self._mget()
+    if self._rp is not None:continue
    chunk=min(self._spt-tp,n-pos)
    if chunk<=0:tp=0;self._atick();continue
-   for c in self.ch:
-    buf=_mix(c,self.mod,chunk)
-    if buf is not None:
-     pan=c.pan/255.0
-     lv=math.sqrt(max(0.0,1.0-pan));rv=math.sqrt(pan)
-     left[pos:pos+chunk]+=buf*lv
-     right[pos:pos+chunk]+=buf*rv
-   pos+=chunk;tp+=chunk
-   if tp>=self._spt:
-    tp=0;self._atick()
-    if self.ended:break
+   if self._vb.shape[1]<chunk:
+    self._vb=np.empty((self.nc,n),dtype=np.float32)
+    self._acc=np.empty((len(self._parts),n,2),dtype=np.float32)
+   o=out[pos:pos+chunk]
+   if self.stem:self._mixs(chunk,o,pos,n)
+   else:
+    if len(self._parts)>1 and chunk*sum(c.on for c in self.ch)>=MTMIN:
+     fs=[_tpool().submit(self._mixg,t,chunk) for t in range(len(self._parts))]
+     for f in fs:
+      a=f.result()
+      if a is not None:o+=a
+    else:
+     a=self._mixg(-1,chunk)
+     if a is not None:o+=a
+    self._vp.mix(self.mod,chunk,o,self._sc)
+   if self._rec is not None:
+    r=self._rec;k=r[2]+chunk
+    if k<=len(r[1]):r[1][r[2]:k]=o;r[2]=k
+    else:self._rec=None
+   pos+=chunk;tp+=chunk;self._done+=chunk
+   if tp>=self._spt:tp=0;self._atick()
   self._tp=tp
-  # scale: target RMS ~0.5 per channel, each channel contributes ~1/nc
-  sc=1.0/max(1,self.nc//4)
-  np.clip(left*sc,-1.0,1.0,out=left)
-  np.clip(right*sc,-1.0,1.0,out=right)
-  out=np.empty((n,2),dtype=np.float32)
-  out[:,0]=left;out[:,1]=right
+  if self.clip:np.clip(out,-1.0,1.0,out=out)
   return out
 
+ # ── row memoization ──────────────────────────────────────────────────────────
+
+ _MKS=tuple(a for a in Trk.__slots__ if a not in('gl','gr','gk'))
+
+ def _mkey(self):
+  """Everything the current row's audio depends on: the row cells, timing
+  (taken at tick 0, offset 0), mix gain and every channel's state after row
+  processing."""
+  ks=self._MKS
+  return(tuple(self.mod.row(self.op,self.row)),self.spd,self.bpm,self._spt,self._sc,
+         tuple(tuple(getattr(c,a) for a in ks) for c in self.ch))
+
+ def _mget(self):
+  """At a row start: replay the row from the cache, or start recording it.
+  Rows with background voices or during stem export are not memoized."""
+  if self.stem or self._vp.act.any():return
+  k=self._mkey();v=self._mc.get(k)
+  if v is not None:self._rp=(v[0],0,v[1])
+  else:self._rec=[k,np.empty((self.spd*self._spt,2),dtype=np.float32),0]
+
+ def _mput(self):
+  """Row finished: store its PCM and end state if it was recorded whole."""
+  k,b,f=self._rec;self._rec=None
+  if f==len(b) and not self._vp.act.any():
+   self._mc.put(k,b,tuple(tuple(getattr(c,a) for a in Trk.__slots__) for c in self.ch))
+
+ def _mset(self,end):
+  """Restore the channel state recorded at the end of a memoized row."""
+  for c,st in zip(self.ch,end):
+   for a,v in zip(Trk.__slots__,st):setattr(c,a,v)
+  self.tick=self.spd-1
+
+ def _mixg(self,t,n):
+  """Resample channel group t (-1 = all channels) into its scratch rows and
+  return their summed (n,2) contribution, or None if all are silent."""
+  lo,chans=self._parts[t] if t>=0 else(0,self.ch)
+  vb=self._vb;G=self._G;k=lo
+  for c in chans:
+   if _mix(c,self.mod,n,vb[k,:n],self.interp,self.sr) is not None:G[k]=self._pg(c);k+=1
+  if k==lo:return None
+  if t<0:return vb[lo:k,:n].T@G[lo:k]
+  return np.matmul(vb[lo:k,:n].T,G[lo:k],out=self._acc[t,:n])
+
+ def _mixs(self,n,o,pos,bn):
+  """Stem-export mix of one chunk: each voice's (n,2) share is added to its
+  stem in self.stems (bn-frame block buffers) as it is folded into o."""
+  vb=self._vb[0,:n,None];st=self.stems
+  def put(key,v):
+   b=st.get(key)
+   if b is None:b=st[key]=np.zeros((bn,2),dtype=np.float32)
+   b[pos:pos+n]+=v
+  for i,c in enumerate(self.ch):
+   if _mix(c,self.mod,n,self._vb[0,:n],self.interp,self.sr) is None:continue
+   v=vb*np.array(self._pg(c),dtype=np.float32)
+   o+=v;put(self._skey(i,c),v)
+  self._vp.mix(self.mod,n,o,self._sc,put)
+
  def _worker(self):
-  while self.playing and not self.ended:
+  while self.playing:
+   if self.ended:
+    if self._pt:self._pt.join()     # next song still loading: wait for it
+    if self._nx is None:break
    if self.paused:time.sleep(0.02);continue
    try:
-    blk=self._gen_block(BLKSIZE)
-    self._q.put(blk,timeout=1.0)
-   except queue.Full:pass
+    i=self._free.get(timeout=1.0)
+    self._gen_block(BLKSIZE,self._ring[i]);self._snap[i]=self._snapshot();self._q.put(i)
+   except queue.Empty:pass
    except Exception as e:
     import traceback;traceback.print_exc();break
 
  def _cb(self,out,frames,ti,st):
   if not self.playing or self.paused:out.fill(0);return
-  try:
-   blk=self._q.get_nowait()
-   n=min(frames,len(blk));out[:n]=blk[:n]
-   if n<frames:out[n:].fill(0)
-  except queue.Empty:out.fill(0)
+  if self.direct:self._gen_block(frames,out);self.now=self._snapshot();return
+  try:i=self._q.get_nowait()
+  except queue.Empty:out.fill(0);return
+  n=min(frames,BLKSIZE);out[:n]=self._ring[i][:n];self.now=self._snap[i]
+  if n<frames:out[n:].fill(0)
+  self._free.put(i)
 
  def start(self):
+  global sd
+  if sd is None:
+   try:import sounddevice as sd
+   except ImportError:raise RuntimeError('no audio output: pip install sounddevice')
   self.playing=True;self.paused=self.ended=False
   self._row0()
-  self._wt=threading.Thread(target=self._worker,daemon=True)
-  self._wt.start()
-  self._st=sd.OutputStream(samplerate=SR,channels=2,dtype='float32',
+  if not self.direct:
+   self._wt=threading.Thread(target=self._worker,daemon=True)
+   self._wt.start()
+  self._st=sd.OutputStream(samplerate=self.sr,channels=2,dtype='float32',
                             blocksize=BLKSIZE,callback=self._cb)
   self._st.start()
 
@@ -974,36 +1630,412 @@ class Player:
    self.op=self.row=self.tick=self._tp=0
    self._pb=self._pj=-1;self._lsr=self._lsc=0
    self.spd=self.mod.spd;self.bpm=self.mod.bpm
-   self._spt=self._gspt();self.ended=False
+   self._spt=self._gspt();self.ended=False;self._done=0;self._rec=self._rp=self.now=None
    for c in self.ch:c.__init__()
-   self._ipan()
+   self._vp.reset();self._ipan()
    while not self._q.empty():
-    try:self._q.get_nowait()
+    try:self._free.put(self._q.get_nowait())
     except:pass
   if was:self.start()
 
  def toggle_pause(self):self.paused=not self.paused
 
+ def _measure(self,limit=3600):
+  """Frames until the song ends or comes back to a row it already played
+  (its loop point). Runs the sequencer only, nothing is mixed."""
+  self._row0();seen=set();fr=0;lim=limit*self.sr
+  while not self.ended and fr<lim:
+   if self.tick==0:
+    k=(self.op,self.row,self._lsc)
+    if k in seen:break
+    seen.add(k)
+   fr+=self._spt;self._atick()
+  return fr
+
+ def _preload(self):
+  """Background: load, measure and pre-roll the next playable file."""
+  n=len(self.plist)
+  for k in range(1,n+1):
+   i=(self._pi+k)%n;f=self.plist[i]
+   try:
+    p=Player(load(f),self._vp.n,self._vp.steal,threads=self.threads,sr=self.sr,interp=self.interp)
+    p._fp=f;p._pi=i;p.plist=self.plist
+    p.length=Player(p.mod,sr=self.sr)._measure()
+    p.mod.bank();p._row0()
+    self._nx=p;return
+   except Exception:continue
+
+ def _adopt(self):
+  """Switch to the preloaded next song in place: same stream, same ring."""
+  nx=self._nx;self._nx=self._pt=None
+  for a in self._SONG:setattr(self,a,getattr(nx,a))
+
+ def blocks(self,n=BLKSIZE,maxlen=None):
+  """Headless render: yield (n,2) float32 blocks until the song ends
+  (or after maxlen seconds)."""
+  self._row0();left=int(maxlen*self.sr) if maxlen else -1
+  while not self.ended and left!=0:
+   b=self._gen_block(n)
+   if left>0:b=b[:left];left-=len(b)
+   yield b
+
+ def _snapshot(self):
+  """Immutable view of the block just rendered, for the UI thread:
+  (mod,op,row,spd,bpm,frames done,levels,samples). Levels are the channels'
+  gains (volume x envelope x fade), so no sample data is scanned."""
+  sc=self._sc or 1.0
+  return(self.mod,self.op,self.row,self.spd,self.bpm,self._done,
+         tuple(math.hypot(c.gl,c.gr)/sc if c.on else 0.0 for c in self.ch),
+         tuple(c.snum for c in self.ch))
+
  @property
  def stat(self):
-  col='\033[33m' if self.paused else '\033[35m' if self.ended else '\033[32m'
-  tag='PAUSED' if self.paused else 'ENDED ' if self.ended else 'PLAY  '
-  op=min(self.op,self.mod.sl-1)
-  return(f"{col}{tag}\033[0m  ord:{self.op:02d}/{self.mod.sl-1:02d}"
-         f"  pat:{self.mod.orders[op]:03d}  row:{self.row:03d}"
-         f"  spd:{self.spd}  bpm:{self.bpm}")
+  s=self.now   # last block handed to the audio device, not the worker's state
+  m,op,row,spd,bpm,fr=s[:6] if s else(self.mod,self.op,self.row,self.spd,self.bpm,self._done)
+  end=self.ended and self._q.empty()
+  col='\033[33m' if self.paused else '\033[35m' if end else '\033[32m'
+  tag='PAUSED' if self.paused else 'ENDED ' if end else 'PLAY  '
+  o=min(op,m.sl-1);t=fr//self.sr
+  return(f"{col}{tag}\033[0m  ord:{op:02d}/{m.sl-1:02d}"
+         f"  pat:{m.orders[o]:03d}  row:{row:03d}"
+         f"  spd:{spd}  bpm:{bpm}  {t//60}:{t%60:02d}")
+
+_TP=None
+def _tpool():
+ """Shared mixing thread pool, one worker per core."""
+ global _TP
+ if _TP is None:
+  from concurrent.futures import ThreadPoolExecutor
+  _TP=ThreadPoolExecutor(os.cpu_count() or 2,thread_name_prefix='mbmp-mix')
+ return _TP
+
+def song_length(mod):
+ """Song length in seconds, up to the end or the first repeated row."""
+ p=Player(mod);return p._measure()/p.sr
+
+# ── loudness ──────────────────────────────────────────────────────────────────
+
+def _kw(n,sr):
+ """Squared magnitude of the BS.1770 K-weighting filter (high shelf +
+ high pass) at the rfft bins of an n-point segment."""
+ def biq(fc,q,vh=1.0,vb=1.0,hp=False):
+  k=math.tan(math.pi*fc/sr);a0=1+k/q+k*k
+  b=[1.0,-2.0,1.0] if hp else[(vh+vb*k/q+k*k)/a0,2*(k*k-vh)/a0,(vh-vb*k/q+k*k)/a0]
+  return b,[1.0,2*(k*k-1)/a0,(1-k/q+k*k)/a0]
+ z=np.exp(-1j*np.pi*np.arange(n//2+1)/(n/2))
+ h=np.ones(len(z))
+ vh=10**(3.999843853973347/20)
+ for b,a in(biq(1681.974450955533,0.7071752369554196,vh,vh**0.4996667741545416),
+            biq(38.13547087602444,0.5003270373238773,hp=True)):
+  h*=np.abs(np.polyval(b[::-1],z))**2/np.abs(np.polyval(a[::-1],z))**2
+ return h
+
+class Loudness:
+ """Streaming peak, RMS and gated loudness meter (BS.1770-style: K-weighted
+ 100 ms segments, applied in the frequency domain, 400 ms gating blocks)."""
+ def __init__(self,sr=None):
+  sr=sr or SR;self.seg=sr//10;self.buf=np.zeros((0,2),dtype=np.float32)
+  self.pw=[];self.peak=0.0;self.ss=0.0;self.n=0
+  # Parseval weights for a one-sided spectrum, folded into the K response
+  w=np.full(self.seg//2+1,2.0);w[0]=1.0
+  if self.seg%2==0:w[-1]=1.0
+  self.w=w*_kw(self.seg,sr)/float(self.seg)**2
+
+ def add(self,b):
+  if not len(b):return
+  self.peak=max(self.peak,float(np.abs(b).max()))
+  self.ss+=float(np.square(b,dtype=np.float64).sum());self.n+=len(b)
+  buf=np.concatenate((self.buf,b));k=len(buf)//self.seg
+  if k:
+   X=np.fft.rfft(buf[:k*self.seg].reshape(k,self.seg,2),axis=1)
+   self.pw.append(np.einsum('kfc,f->k',X.real**2+X.imag**2,self.w))
+  self.buf=buf[k*self.seg:]
+
+ def result(self):
+  """(peak, rms, loudness in LUFS; -inf when silent)."""
+  rms=math.sqrt(self.ss/(2*self.n)) if self.n else 0.0
+  p=np.concatenate(self.pw) if self.pw else np.zeros(0)
+  if len(p)>=4:p=np.convolve(p,np.full(4,0.25),'valid')
+  p=p[p>10**((-70+0.691)/10)]                        # absolute gate
+  if len(p):p=p[p>p.mean()*10**(-1.0)]               # relative gate (-10 LU)
+  lu=-0.691+10*math.log10(p.mean()) if len(p) else float('-inf')
+  return self.peak,rms,lu
+
+def analyze(path,fast=True):
+ """Measure one pass through the song and cache its normalization gain
+ (to LTARGET, capped so the peak stays under PEAKMAX); Players pick the gain
+ up from the cache when NORM is on. fast: nearest-neighbour resampling.
+ Returns (gain, peak, rms, loudness)."""
+ m=load(path);p=Player(m,norm=False,interp='nearest' if fast else None);p.clip=False
+ lm=Loudness(p.sr)
+ for b in p.blocks(maxlen=song_length(m)):lm.add(b)
+ pk,rms,lu=lm.result()
+ g=1.0
+ if pk>0 and lu>float('-inf'):g=min(10**((LTARGET-lu)/20),PEAKMAX/pk)
+ _cput('gain',m.fk,np.array([g,pk,rms,lu]))
+ return g,pk,rms,lu
+
+# ── streaming server ──────────────────────────────────────────────────────────
+
+def _pcm16(blk):return(np.clip(blk,-1.0,1.0)*32767).astype('<i2').tobytes()
+
+def _wavhdr(sr=None,nch=2,size=0xFFFFFFFF):
+ """16-bit PCM WAV header; the default size marks an open-ended stream."""
+ sr=sr or SR
+ return(b'RIFF'+struct.pack('<I',min(size+36,0xFFFFFFFF))+b'WAVEfmt '
+        +struct.pack('<IHHIIHH',16,1,nch,sr,sr*nch*2,nch*2,16)+b'data'+struct.pack('<I',size))
+
+class Hub:
+ """Fans rendered PCM out to all connected clients. Each client has its own
+ bounded queue; a client that falls SBACKLOG blocks behind is dropped."""
+ def __init__(self,wav=False,backlog=SBACKLOG):
+  self.cl={};self.wav=wav;self.backlog=backlog
+
+ async def client(self,rd,wr):
+  import asyncio
+  q=asyncio.Queue(self.backlog);self.cl[q]=wr
+  try:
+   if self.wav:wr.write(_wavhdr())
+   while True:
+    b=await q.get()
+    if b is None:break
+    wr.write(b);await wr.drain()
+  except(ConnectionError,OSError):pass
+  finally:
+   self.cl.pop(q,None);wr.close()
+
+ def push(self,b):
+  import asyncio
+  for q,wr in list(self.cl.items()):
+   try:q.put_nowait(b)
+   except asyncio.QueueFull:     # slow consumer: drop it, never stall the render
+    del self.cl[q]
+    while not q.empty():q.get_nowait()
+    q.put_nowait(None);wr.transport.abort()
+
+async def _render(files,hub):
+ import asyncio
+ loop=asyncio.get_running_loop();t0=loop.time();sent=0
+ while True:
+  ok=False
+  for f in files:
+   try:p=Player(load(f))
+   except Exception as e:print(f"skip {f}: {e}",flush=True);await asyncio.sleep(0);continue
+   print(f"now playing {Path(f).name}",flush=True);ok=True
+   it=p.blocks(maxlen=song_length(p.mod))
+   while True:
+    blk=await loop.run_in_executor(None,next,it,None)
+    if blk is None:break
+    hub.push(_pcm16(blk));sent+=len(blk)/p.sr
+    # pace to real time, keeping SLEAD seconds rendered ahead
+    d=t0+sent-SLEAD-loop.time()
+    if d>0:await asyncio.sleep(d)
+  if not ok:print('error: no playable files',flush=True);return False
+
+def serve(files,addr,wav=False):
+ """Render files once, in a loop, and stream s16le stereo PCM to every client.
+ addr: 'host:port' or 'unix:/path/to.sock'. False if nothing could be played."""
+ if not files:print('nothing to play');return False
+ import asyncio
+ async def main():
+  hub=Hub(wav)
+  if addr.startswith('unix:'):srv=await asyncio.start_unix_server(hub.client,addr[5:])
+  else:
+   h,_,pt=addr.rpartition(':')
+   srv=await asyncio.start_server(hub.client,h or None,int(pt))
+  print(f"streaming {len(files)} file(s) on {addr} ({'wav' if wav else 'raw s16le'} {SR}Hz)",flush=True)
+  async with srv:return await _render(files,hub)
+ try:return asyncio.run(main())!=False
+ except KeyboardInterrupt:return True
+
+# ── headless commands ─────────────────────────────────────────────────────────
+
+class Peaks:
+ """Waveform overview built on the fly from rendered blocks: one (min,max)
+ pair per PEAKW frames per channel, as int8 (-127..127)."""
+ def __init__(self,w=PEAKW):
+  self.w=w;self.buf=np.zeros((0,2),dtype=np.float32);self.out=[]
+ def add(self,b):
+  buf=np.concatenate((self.buf,b)) if len(self.buf) else b
+  k=len(buf)//self.w
+  if k:
+   x=buf[:k*self.w].reshape(k,self.w,2)
+   self.out.append(np.stack((x.min(1),x.max(1)),2))   # (k,2 channels,2)
+  self.buf=buf[k*self.w:]
+ def result(self):
+  """int8 array of shape (pairs, 2 channels, 2 = min/max)."""
+  if len(self.buf):self.add(np.zeros((self.w-len(self.buf),2),dtype=np.float32))
+  a=np.concatenate(self.out) if self.out else np.zeros((0,2,2),dtype=np.float32)
+  return np.round(np.clip(a,-1.0,1.0)*127).astype(np.int8)
+
+def peaks(path):
+ """Waveform overview of one pass through the song, stored in the module
+ cache ('peaks' kind, keyed by content hash) for UIs and seek bars."""
+ m=load(path);p=Player(m);pk=Peaks()
+ for b in p.blocks(maxlen=song_length(m)):pk.add(b)
+ a=pk.result();_cput('peaks',m.fk,a)
+ return a
+
+def render_wav(src,dst,maxlen=None):
+ """Render a module to a 16-bit stereo WAV file (default: one pass through
+ the song, see song_length); its peaks are cached along the way.
+ Returns the seconds written."""
+ p=Player(load(src));n=0;pk=Peaks()
+ if maxlen is None:maxlen=song_length(p.mod)
+ with open(dst,'wb') as f:
+  f.write(_wavhdr(p.sr,size=0))
+  for b in p.blocks(maxlen=maxlen):f.write(_pcm16(b));pk.add(b);n+=len(b)
+  f.seek(0);f.write(_wavhdr(p.sr,size=n*4))
+ _cput('peaks',p.mod.fk,pk.result())
+ return n/p.sr
+
+class WavOut:
+ """16-bit stereo WAV file fed with float blocks; the header is patched
+ with the final size on close. pad() inserts silence (for late stems)."""
+ def __init__(self,path,sr=None):
+  self.sr=sr or SR;self.n=0
+  self.f=open(path,'wb',buffering=1<<20);self.f.write(_wavhdr(self.sr,size=0))
+ def write(self,blk):self.f.write(_pcm16(blk));self.n+=len(blk)
+ def pad(self,n):
+  if n>self.n:self.f.write(bytes((n-self.n)*4));self.n=n
+ def close(self):
+  self.f.seek(0);self.f.write(_wavhdr(self.sr,size=self.n*4));self.f.close()
+
+def render_stems(src,dst,by='channel',maxlen=None):
+ """Render a module once into folder dst: mix.wav plus one WAV per channel
+ (by='channel', ch01.wav..) or per instrument (by='ins', ins01.wav..).
+ Stems carry the same gains as the mix, so they sum to it (before clipping).
+ Files are written by a background thread while the next block renders.
+ Returns the seconds rendered."""
+ p=Player(load(src));p.stem=by;dst=Path(dst);dst.mkdir(parents=True,exist_ok=True)
+ if maxlen is None:maxlen=song_length(p.mod)
+ q=queue.Queue(maxsize=QMAX);outs={}
+ def writer():
+  while True:
+   it=q.get()
+   if it is None:break
+   t,blk,stems=it
+   outs['mix'].write(blk)
+   for k,v in stems.items():
+    w=outs.get(k)
+    if w is None:w=outs[k]=WavOut(dst/f"{'ch' if by=='channel' else 'ins'}{k+(by=='channel'):02d}.wav",p.sr)
+    w.pad(t);w.write(v[:len(blk)])
+ outs['mix']=WavOut(dst/'mix.wav',p.sr)
+ wt=threading.Thread(target=writer,daemon=True);wt.start();t=0
+ for b in p.blocks(maxlen=maxlen):q.put((t,b,p.stems));t+=len(b)
+ q.put(None);wt.join()
+ for w in outs.values():w.pad(t);w.close()
+ return t/p.sr
+
+def info(files,length=False):
+ """Print one tab-separated metadata line per file (optionally its length)."""
+ for f in files:
+  try:
+   m=load(f);ln=f"\t{song_length(m):.2f}" if length else ''
+   print(f"{f}\t{m.fmt}\t{m.nc}\t{len(m.smp)-1}{ln}\t{m.title}")
+  except Exception as e:print(f"{f}\terror: {e}")
+
+def _vwork(conn,mem):
+ """validate() worker: cap this process's memory, then run the loader on
+ each path received and send back (ok,path,bytes,seconds,fmt or error
+ key,message) until None arrives."""
+ global CACHE
+ CACHE=''   # time the loaders, not the decode cache
+ try:
+  import resource
+  try:cur=int(open('/proc/self/statm').read().split()[0])*os.sysconf('SC_PAGE_SIZE')
+  except:cur=0
+  resource.setrlimit(resource.RLIMIT_AS,(cur+mem,cur+mem))
+ except:pass   # no rlimits here (Windows): only the time cap applies
+ import traceback
+ while True:
+  f=conn.recv()
+  if f is None:break
+  n=0;t=time.perf_counter()
+  try:
+   a=_arc_split(f) if not os.path.isfile(f) else None
+   data=_arc_read(*a) if a else Path(f).read_bytes();n=len(data)
+   t=time.perf_counter();m=LOADERS.get(Path(f).suffix.lower(),_load_mod)(data)
+   conn.send((True,f,n,time.perf_counter()-t,m.fmt,''))
+  except BaseException as e:
+   tb=traceback.extract_tb(e.__traceback__);fr=tb[-1] if tb else None
+   k=type(e).__name__;k=k if type(e).__module__=='builtins' else f"{type(e).__module__}.{k}"
+   k+=f" in {fr.name}:{fr.lineno}" if fr else ''
+   conn.send((False,f,n,time.perf_counter()-t,k,str(e)[:100]))
+   if isinstance(e,KeyboardInterrupt):break
+
+def validate(files,jobs=None,mem=VMEM,tmo=VTIME,top=10):
+ """Run the loaders over files in jobs worker processes, each capped at
+ mem MB and tmo seconds per file (a stuck or crashed worker is replaced),
+ and print a throughput report. Returns the list of failed paths."""
+ import multiprocessing as mp
+ from multiprocessing.connection import wait
+ todo=list(reversed(files));ws={};res=[];t0=time.perf_counter()
+ def feed(c):
+  if todo:f=todo.pop();c.send(f);ws[c][1:]=[f,time.perf_counter()]
+  else:c.send(None);ws.pop(c)[0].join()
+ def spawn():
+  a,b=mp.Pipe();p=mp.Process(target=_vwork,args=(b,int(mem*2**20)),daemon=True)
+  p.start();b.close();ws[a]=[p,None,0.0];feed(a)
+ def lost(c,why):
+  p,f,t=ws.pop(c);p.kill();p.join()
+  res.append((False,f,os.path.getsize(f) if os.path.isfile(f) else 0,time.perf_counter()-t,why,''))
+  if todo:spawn()
+ for _ in range(max(1,min(jobs or os.cpu_count() or 1,len(files)))):spawn()
+ while ws:
+  for c in wait(list(ws),timeout=0.1):
+   try:r=c.recv()
+   except EOFError:lost(c,f"crashed (exit {ws[c][0].exitcode})");continue
+   res.append(r);feed(c)
+  now=time.perf_counter()
+  for c,(p,f,t) in list(ws.items()):
+   if f and now-t>tmo:lost(c,f"timeout (>{tmo:g}s)")
+ wall=time.perf_counter()-t0
+ ok=[r for r in res if r[0]];bad=[r for r in res if not r[0]]
+ mb=sum(r[2] for r in res)/2**20
+ print(f"{len(res)} files  {len(ok)} ok  {len(bad)} failed  {wall:.2f}s  "
+       f"{len(res)/wall:.1f} files/s  {mb/wall:.2f} MB/s")
+ by={}
+ for r in ok:v=by.setdefault(r[4],[0,0,0.0]);v[0]+=1;v[1]+=r[2];v[2]+=r[3]
+ for k,(n,b,t) in sorted(by.items()):
+  print(f"  {k:4s}{n:7d} files {b/2**20:9.2f} MB  loader {t:.2f}s  {b/2**20/max(t,1e-9):.1f} MB/s")
+ if bad:
+  print('failures:');grp={}
+  for r in bad:grp.setdefault(r[4],[]).append(r)
+  for k,rs in sorted(grp.items(),key=lambda x:-len(x[1])):
+   print(f"  {len(rs):5d}  {k}  {rs[0][5]}")
+   for r in rs[:3]:print(f"         {r[1]}")
+ print('slowest:')
+ for r in sorted(res,key=lambda r:-r[3])[:top]:
+  print(f"  {r[3]:8.3f}s {r[2]/2**20:8.2f} MB  {r[1]}{'' if r[0] else '  ('+r[4]+')'}")
+ return[r[1] for r in bad]
 
 # ── file browsing ─────────────────────────────────────────────────────────────
 
 def find_files(path):
  p=Path(path)
  if p.is_file() and p.suffix.lower() in EXTS:return [str(p)]
+ if p.is_file() and p.suffix.lower() in ARCS:return _arc_list(str(p))
  if p.is_dir():
   r=[]
   for e in EXTS:r.extend(str(f) for f in sorted(p.rglob(f'*{e}')))
+  for e in ARCS:
+   for f in p.rglob(f'*{e}'):r.extend(_arc_list(str(f)))
   return sorted(set(r))
+ if p.suffix.lower() in EXTS and _arc_split(path):return [str(p)]
  import glob as _g
- return [f for f in _g.glob(path,recursive=True) if Path(f).suffix.lower() in EXTS]
+ r=[]
+ for f in _g.glob(path,recursive=True):
+  if Path(f).suffix.lower() in EXTS:r.append(f)
+  elif Path(f).suffix.lower() in ARCS:r.extend(_arc_list(f))
+ return r
+
+def args_files(parts):
+ """Files for command-line path arguments: one path with spaces if the joined
+ arguments exist, otherwise each argument on its own."""
+ j=' '.join(parts).strip('"').strip("'") or '.'
+ if Path(j).exists() or len(parts)<2:return find_files(j)
+ return [f for x in parts for f in find_files(x)]
 
 def pick(files):
  if not files:return None
@@ -1024,6 +2056,8 @@ def load_play(path,cur):
  if not chosen:return cur,'cancelled'
  try:
   p=Player(load(chosen));p._fp=chosen
+  if GAPLESS:   # keep playing the rest of the list, no gaps between songs
+   p.plist=files;p._pi=files.index(chosen);p.length=Player(p.mod,sr=p.sr)._measure()
   if cur:cur.stop()
   p.start();return p,''
  except Exception as e:
@@ -1040,35 +2074,91 @@ def prompt_load(cur):
 # ── UI ────────────────────────────────────────────────────────────────────────
 
 G='\033[1;32m';D='\033[90m';R='\033[0m';Y='\033[33m';C='\033[36m'
+NN=['C-','C#','D-','D#','E-','F-','F#','G-','G#','A-','A#','B-']
+
+_SCR=[]   # lines currently on screen, for _draw
+def _cls():sys.stdout.write('\033[2J');_SCR.clear()
+
+def _draw(lines):
+ """Rewrite only the screen lines that changed since the last call."""
+ out=''
+ for i,l in enumerate(lines):
+  if i>=len(_SCR) or _SCR[i]!=l:out+=f"\033[{i+1};1H{l}\033[K"
+ if len(lines)<len(_SCR):out+=f"\033[{len(lines)+1};1H\033[J"
+ _SCR[:]=lines
+ if out:sys.stdout.write(out);sys.stdout.flush()
+
+def _cell(fmt,c):
+ """One pattern cell as 10 columns of tracker text: note, instrument, effect."""
+ if c is None:return ' '*10
+ if fmt=='MOD':
+  ins,per,e,p=c;n=round(12*math.log2(1712/per)) if per else -1;nt=None
+ else:
+  nt,ins,_,e,p=c;n=-1
+  if fmt=='S3M':
+   if nt<254:n=(nt>>4)*12+(nt&15)
+  elif fmt=='XM':
+   if 0<nt<97:n=nt-1
+   nt=253 if nt==97 else None
+  elif nt<120:n=nt
+ ns=f"{NN[n%12]}{n//12}" if n>=0 else '^^^' if nt==254 else '===' if nt==253 else '---'
+ if fmt in('MOD','XM'):es=f"{'0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ'[e%36]}{p:02X}" if e or p else '...'
+ else:es=f"{chr(64+e)}{p:02X}" if 0<e<27 else '...'
+ return f"{ns} {ins:02X} {es}" if ins else f"{ns} .. {es}"
+
+_PK=[None,None]   # (mod, per-sample peak list) for VU meters
+def _speak(m):
+ """Peak amplitude of every sample of m, computed once per module."""
+ if _PK[0] is not m:_PK[:]=[m,[float(np.abs(s.data).max()) if len(s.data) else 0.0 for s in m.smp]]
+ return _PK[1]
+
+def view(pl,w,h):
+ """Pattern rows around the row being heard, and per-channel VU meters,
+ drawn from the player's latest playback snapshot (Player.now)."""
+ s=pl.now if pl else None
+ if not s:return[]
+ m,op,row,_,_,_,lv,sn=s
+ if op>=m.sl:return[]
+ pat=m.pats[m.orders[op]];nch=max(1,min(m.nc,(w-4)//11));half=max(1,(h-10)//2)
+ pk=_speak(m)
+ ls=[f"{D}    "+''.join(f"ch{i+1:02d}".ljust(11) for i in range(nch))+R]
+ for r in range(row-half,row+half+1):
+  if not 0<=r<len(pat):ls.append('');continue
+  cs=pat[r];t=' '.join(_cell(m.fmt,cs[i] if i<len(cs) else None) for i in range(nch))
+  ls.append(f"{G}{r:03d} {t}{R}" if r==row else f"{D}{r:03d}{R} {t}")
+ ls.append('    '+' '.join(f"{G}{'|'*int(min(1.0,lv[i]*pk[sn[i]] if sn[i]<len(pk) else 0)*10):<10}{R}" for i in range(nch)))
+ return ls
 
-def render(pl,msg=''):
- out='\033[H'
- out+=(f"{G}MrB-ModPlay{R} {D}|{R} {D}MOD S3M XM IT{R}  "
-       f"{D}P=load  S=stop  SPC=pause  R=restart  Q=quit{R}\033[K\r\n")
- out+=f"{D}{'-'*66}{R}\033[K\r\n"
+def render(pl,msg='',vw=False):
+ import shutil
+ w,h=shutil.get_terminal_size()
+ ls=[f"{G}MrB-ModPlay{R} {D}|{R} {D}MOD S3M XM IT{R}  "
+     f"{D}P=load  S=stop  SPC=pause  R=restart  V=view  Q=quit{R}",
+     f"{D}{'-'*66}{R}"]
  if pl:
   m=pl.mod;nm=Path(pl._fp).name if hasattr(pl,'_fp') else '?'
   fmode=('amiga','linear')[m.linear]
-  out+=(f"  {G}{nm}{R}  "
-        f"{D}{m.title or '(untitled)'}  "
-        f"[{C}{m.fmt}{D}  {m.nc}ch  {len(m.smp)-1}smp  {fmode}]{R}\033[K\r\n")
-  out+=f"  {pl.stat}\033[K\r\n"
+  ls.append(f"  {G}{nm}{R}  "
+            f"{D}{m.title or '(untitled)'}  "
+            f"[{C}{m.fmt}{D}  {m.nc}ch  {len(m.smp)-1}smp  {fmode}]{R}")
+  ls.append(f"  {pl.stat}")
  else:
-  out+=f"  {D}no module loaded -- press P to load{R}\033[K\r\n"
- if msg:out+=f"  {Y}>> {msg}{R}\033[K\r\n"
- out+='\033[J'
- sys.stdout.write(out);sys.stdout.flush()
+  ls.append(f"  {D}no module loaded -- press P to load{R}")
+ ls.append(f"  {Y}>> {msg}{R}" if msg else '')   # fixed slot: lines below stay put
+ if vw:ls+=view(pl,w,h)
+ _draw(ls)
 
-def run(pl=None,msg=''):
- sys.stdout.write('\033[2J');raw_on()
+def run(pl=None,msg='',vw=False):
+ _cls();raw_on()
  try:
   while True:
-   render(pl,msg);msg='';time.sleep(0.12)
+   render(pl,msg,vw);msg='';time.sleep(0.05 if vw else 0.12)
    if not kbhit():continue
    k=getch()
    if k.lower()=='q':break
+   elif k.lower()=='v':vw=not vw;_cls()
    elif k.lower()=='p':
-    pl,msg=prompt_load(pl);sys.stdout.write('\033[2J')
+    pl,msg=prompt_load(pl);_cls()
     msg=msg or(f"playing {Path(pl._fp).name}" if pl else 'no file')
    elif k.lower()=='s':
     if pl:pl.stop();msg='stopped'
@@ -1082,8 +2172,60 @@ def run(pl=None,msg=''):
   sys.stdout.write('\033[2J\033[H');print(f'{G}bye{R}\n')
 
 if __name__=='__main__':
+ import argparse
+ ap=argparse.ArgumentParser(prog='mbmp')
+ ap.add_argument('path',nargs='*',help='file, folder or glob')
+ ap.add_argument('--serve',metavar='ADDR',help='stream PCM to clients on host:port or unix:/path')
+ ap.add_argument('--wav',action='store_true',help='frame streamed PCM as WAV')
+ ap.add_argument('--gapless',action='store_true',help='play the whole list back to back')
+ ap.add_argument('--threads',type=int,default=MTHREADS,metavar='N',help='mix voices on N threads')
+ ap.add_argument('--memo',type=float,default=MEMO,metavar='MB',help='reuse rendered rows that repeat (cache size)')
+ ap.add_argument('--info',action='store_true',help='print format/channels/samples/title')
+ ap.add_argument('--length',action='store_true',help='print song lengths (seconds)')
+ ap.add_argument('--render',metavar='OUT',help='render to OUT.wav (or into folder OUT)')
+ ap.add_argument('--stems',metavar='DIR',help='render mix + per-channel WAVs into DIR/<name>/')
+ ap.add_argument('--stems-by',choices=('channel','ins'),default='channel',help='split stems by channel or instrument')
+ ap.add_argument('--validate',action='store_true',help='bulk-load every file in worker processes and report')
+ ap.add_argument('--jobs',type=int,default=0,metavar='N',help='--validate worker processes (default: one per core)')
+ ap.add_argument('--analyze',action='store_true',help='measure loudness and cache normalization gains')
+ ap.add_argument('--no-norm',action='store_true',help='ignore cached normalization gains')
+ ap.add_argument('--peaks',action='store_true',help=f'cache min/max waveform peaks ({PEAKW} frames per pair)')
+ ap.add_argument('--rate',type=int,default=SR,metavar='HZ',help='output sample rate (e.g. 22050 32000 48000 96000)')
+ ap.add_argument('--interp',choices=('nearest','linear','cubic'),default=INTERP,help='sample interpolation')
+ ap.add_argument('--preview',action='store_true',help=f'cheap preview: {PREVIEW_SR} Hz, nearest interpolation')
+ ap.add_argument('--view',action='store_true',help='show pattern rows and channel VU meters')
+ ap.add_argument('--startup-time',action='store_true',help='print startup time and exit')
+ a=ap.parse_args();GAPLESS=a.gapless;MTHREADS=a.threads;NORM=not a.no_norm;MEMO=a.memo
+ SR,INTERP=(PREVIEW_SR,'nearest') if a.preview else(a.rate,a.interp)
+ if a.startup_time:
+  print(f"startup {(time.perf_counter()-_T0)*1000:.1f} ms"
+        f"  (audio backend {'loaded' if 'sounddevice' in sys.modules else 'not loaded'})")
+  sys.exit()
+ arg=' '.join(a.path).strip('"').strip("'")
+ if a.serve:sys.exit(0 if serve(args_files(a.path),a.serve,a.wav) else 1)
+ if a.validate:sys.exit(1 if validate(args_files(a.path),a.jobs) else 0)
+ if a.analyze:
+  for f in args_files(a.path):
+   try:g,pk,rms,lu=analyze(f);print(f"{f}\tpeak {pk:.3f}\trms {rms:.3f}\t{lu:.1f} LUFS\tgain {g:.3f}",flush=True)
+   except Exception as e:print(f"{f}\terror: {e}",flush=True)
+  sys.exit()
+ if a.peaks:
+  for f in args_files(a.path):
+   try:print(f"{f}\t{len(peaks(f))} pairs",flush=True)
+   except Exception as e:print(f"{f}\terror: {e}",flush=True)
+  sys.exit()
+ if a.info or a.length:info(args_files(a.path),a.length);sys.exit()
+ if a.stems:
+  for f in args_files(a.path):
+   print(f"{f}  {render_stems(f,Path(a.stems)/Path(f).stem,a.stems_by):.2f}s",flush=True)
+  sys.exit()
+ if a.render:
+  fs=args_files(a.path);out=Path(a.render)
+  for f in fs:
+   dst=out/(Path(f).stem+'.wav') if out.is_dir() or len(fs)>1 else out
+   if len(fs)>1:out.mkdir(parents=True,exist_ok=True)
+   print(f"{dst}  {render_wav(f,dst):.2f}s",flush=True)
+  sys.exit()
  pl,msg=None,''
- if len(sys.argv)>1:
-  arg=' '.join(sys.argv[1:]).strip('"').strip("'")
-  pl,msg=load_play(arg,None)
- run(pl,msg)
+ if arg:pl,msg=load_play(arg,None)
+ run(pl,msg,a.view)